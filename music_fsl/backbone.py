@@ -1,27 +1,27 @@
-from torchaudio.transforms import MelSpectrogram
 from torch import nn
-import torch 
+import torch
+import torch.nn.functional as F
 
 class ConvBlock(nn.Module):
     """
-    A convolutional block, consisting of a convolution, group normalization,
+    A convolutional block, consisting of a convolution, batch normalization,
     ReLU activation, and max pooling.
     """
 
-    def __init__(self, 
-        in_channels, out_channels, 
-        kernel_size, stride, padding, 
-        num_groups, max_pool_size
+    def __init__(self,
+        in_channels, out_channels,
+        kernel_size, stride, padding,
+        max_pool_size
     ):
         super().__init__()
         self.conv = nn.Conv2d(in_channels, out_channels, kernel_size, stride, padding)
-        self.gn = nn.GroupNorm(num_groups, out_channels)
+        self.bn = nn.BatchNorm2d(out_channels)
         self.relu = nn.ReLU()
         self.maxpool = nn.MaxPool2d(max_pool_size)
 
     def forward(self, x):
         x = self.conv(x)
-        x = self.gn(x)
+        x = self.bn(x)
         x = self.relu(x)
         x = self.maxpool(x)
         return x
@@ -29,41 +29,46 @@ class ConvBlock(nn.Module):
 
 class Backbone(nn.Module):
     """
-    A fully convolutional model that produces 512-dimensional embeddings from audio samples. 
-    
-    Args:
-        sample_rate (int): The sample rate of the input audio.
+    A fully convolutional model that produces 512-dimensional embeddings
+    from mel spectrograms of shape (batch, 1, 64, frames).
+
+    The mel spectrograms are computed (and cached) by the dataset, so the
+    forward pass only runs the conv stack.
     """
 
-    def __init__(self, sample_rate: int):
+    def __init__(self):
         super().__init__()
-        self.sample_rate = sample_rate
-        self.melspec = MelSpectrogram(
-            n_mels=64, sample_rate=sample_rate
+        self.conv1 = ConvBlock(1, 32, 3, 1, 'same', 2)
+        self.conv2 = ConvBlock(32, 64, 3, 1, 'same', 2)
+        self.conv3 = ConvBlock(64, 128, 3, 1, 'same', 2)
+        self.conv4 = ConvBlock(128, 256, 3, 1, 'same', 2)
+        self.head = nn.Sequential(
+            nn.Linear(256, 512),
+            nn.BatchNorm1d(512),
+            nn.ReLU(),
         )
-        
-        self.conv1 = ConvBlock(1, 32, 3, 1, 'same', 8, 2)
-        self.conv2 = ConvBlock(32, 64, 3, 1, 'same',16, 2)
-        self.conv3 = ConvBlock(64, 128, 3, 1, 'same', 32, 2)
-        self.conv4 = ConvBlock(128, 256, 3, 1, 'same', 64, 2)
-        self.conv5 = ConvBlock(256, 512, 1, 1, 'same', 128, 4)
 
     def forward(self, x: torch.Tensor):
-        assert x.ndim == 3, "Expected a batch of audio samples shape (batch, channels, samples)"
-        assert x.shape[1] == 1, "Expected a mono audio signal"
+        # torch._assert keeps these checks compatible with
+        # torch.compile(fullgraph=True), unlike plain asserts
+        torch._assert(x.ndim == 4, "Expected a batch of mel spectrograms shape (batch, channels, mels, frames)")
+        torch._assert(x.shape[1] == 1, "Expected a single-channel mel spectrogram")
+        torch._assert(x.shape[2] == 64, "Expected a 64-bin mel spectrogram")
 
-        x = self.melspec(x)
+        # NHWC layout hits cudnn's fast tensor-core conv kernels
+        x = x.contiguous(memory_format=torch.channels_last)
 
         x = self.conv1(x)
         x = self.conv2(x)
         x = self.conv3(x)
         x = self.conv4(x)
-        x = self.conv5(x)
 
-        # pool over the time dimension
-        # squeeze the (t, f) dimensions
-        x = x.mean(dim=-1)
-        x = x.squeeze(-1).squeeze(-1) # (batch, 512)
+        # a 1x1 conv followed by pooling is a per-pixel matmul, so pool
+        # down to (batch, 256) first and project with a Linear instead of
+        # materializing a 512-channel activation map
+        x = F.max_pool2d(x, 4)
+        x = F.adaptive_avg_pool2d(x, 1).flatten(1)
+        x = self.head(x)
 
         return x
 
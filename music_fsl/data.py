@@ -1,11 +1,16 @@
 from typing import Optional, Callable, Dict, List, Any, Tuple
+import hashlib
 import random
 from collections import defaultdict
+from pathlib import Path
 
 import torch
 import numpy as np
 import mirdata
+import torchaudio
 from torch.utils.data import Dataset
+from torchaudio.functional import melscale_fbanks
+from torchaudio.transforms import Resample, Spectrogram
 import music_fsl.util as util
 
 
@@ -48,12 +53,22 @@ class TinySOL(ClassConditionalDataset):
     """
     Initialize a `TinySOL` dataset instance.
 
+    Items are mel spectrograms, not raw waveforms. The mel spectrograms
+    for all tracks are computed once and packed into a single cache file
+    that every DataLoader worker maps into shared memory, so sampling an
+    episode only views cached tensors and crops a random excerpt, instead
+    of re-running the STFT for every one of the (many) episodes.
+
     Args:
         instruments (List[str]): A list of instruments to include in the dataset.
-        duration (float): The duration of each audio clip in the dataset (in seconds).
+        duration (float): The duration of each excerpt in the dataset (in seconds).
         sample_rate (int): The sample rate of the audio clips in the dataset (in Hz).
+        cache_dir (str): Directory to cache precomputed mel spectrograms in.
+            Default: ~/.cache/music_fsl.
     """
 
+    N_MELS = 64
+
     INSTRUMENTS = [
         'Bassoon', 'Viola', 'Trumpet in C', 'Bass Tuba',
         'Alto Saxophone', 'French Horn', 'Violin', 
@@ -61,10 +76,11 @@ class TinySOL(ClassConditionalDataset):
         'Clarinet in Bb', 'Oboe', 'Accordion'
     ]
 
-    def __init__(self, 
+    def __init__(self,
             instruments: List[str] = None,
-            duration: float = 1.0, 
+            duration: float = 1.0,
             sample_rate: int = 16000,
+            cache_dir: str = None,
         ):
         if instruments is None:
             instruments = self.INSTRUMENTS
@@ -73,6 +89,29 @@ class TinySOL(ClassConditionalDataset):
         self.duration = duration
         self.sample_rate = sample_rate
 
+        if cache_dir is None:
+            cache_dir = Path.home() / ".cache" / "music_fsl"
+        self.cache_dir = Path(cache_dir) / f"mel-{sample_rate}"
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+        n_fft = 400
+        self.hop_length = n_fft // 2
+        self.spectrogram = Spectrogram(n_fft=n_fft)
+        # precompute the triangular mel filterbank once, so applying it
+        # at cache time is a single matmul per track
+        self.mel_fb = melscale_fbanks(
+            n_freqs=n_fft // 2 + 1,
+            f_min=0.0,
+            f_max=sample_rate / 2,
+            n_mels=self.N_MELS,
+            sample_rate=sample_rate,
+        )
+        # number of mel frames in an excerpt of `duration` seconds
+        self.n_frames = int(duration * sample_rate) // self.hop_length + 1
+
+        # resample transforms, cached per source sample rate
+        self._resamplers = {}
+
         # initialize the tinysol dataset and download if necessary
         self.dataset = mirdata.initialize('tinysol')
         self.dataset.download()
@@ -87,6 +126,16 @@ class TinySOL(ClassConditionalDataset):
             if track.instrument_full in self.instruments:
                 self.tracks.append(track)
 
+        # the packed cache is keyed by the exact set of tracks it covers
+        key = hashlib.md5(
+            "\n".join(track.track_id for track in self.tracks).encode("utf-8")
+        ).hexdigest()
+        self._cache_bin = self.cache_dir / f"{key}.bin"
+        self._cache_idx = self.cache_dir / f"{key}.idx.pt"
+
+        # warm the mel cache up front so workers never touch raw audio
+        self._prepare_cache()
+
 
     @property
     def classlist(self) -> List[str]:
@@ -103,15 +152,92 @@ class TinySOL(ClassConditionalDataset):
 
         return self._class_to_indices
 
+    def _compute_mel(self, audio: torch.Tensor) -> torch.Tensor:
+        # equivalent to torchaudio's MelSpectrogram transform, but with
+        # the precomputed filterbank applied as a single matmul
+        spec = self.spectrogram(audio)
+        return (spec.transpose(-1, -2) @ self.mel_fb).transpose(-1, -2)
+
+    def _prepare_cache(self):
+        """
+        Pack the mel spectrograms for every track in the dataset into a
+        single fp16 cache file plus an index of per-track frame counts.
+        Decode, resample, and mel happen exactly once per track across
+        all runs, and all DataLoader workers share one physical copy of
+        the cache via a shared memory mapping.
+        """
+        if not (self._cache_bin.exists() and self._cache_idx.exists()):
+            # build into temp files and rename once complete, so an
+            # interrupted run can never leave a truncated cache behind
+            tmp_bin = self._cache_bin.with_name(self._cache_bin.name + ".tmp")
+            tmp_idx = self._cache_idx.with_name(self._cache_idx.name + ".tmp")
+            lengths = []
+            with open(tmp_bin, "wb") as f:
+                for track in self.tracks:
+                    mel = self._compute_mel(self._load_audio(track.audio_path))
+                    mel = mel.squeeze(0).to(torch.float16).contiguous()
+                    f.write(mel.numpy().tobytes())
+                    lengths.append(mel.shape[-1])
+            torch.save({"lengths": lengths}, tmp_idx)
+            tmp_bin.rename(self._cache_bin)
+            tmp_idx.rename(self._cache_idx)
+
+        lengths = torch.load(self._cache_idx)["lengths"]
+        # flat element offset of each track's (n_mels, frames) block
+        self._offsets = np.cumsum([0] + [self.N_MELS * n for n in lengths]).tolist()
+        # the shared mapping is created lazily, once per process
+        self._cache = None
+
+    def _load_mel(self, index: int) -> torch.Tensor:
+        """
+        View the cached mel spectrogram for a track out of the shared
+        cache mapping.
+
+        Returns:
+            torch.Tensor: A mel spectrogram of shape (1, n_mels, frames).
+        """
+        if self._cache is None:
+            storage = torch.UntypedStorage.from_file(
+                str(self._cache_bin), shared=True,
+                nbytes=self._offsets[-1] * 2,  # fp16 elements
+            )
+            self._cache = torch.tensor([], dtype=torch.float16).set_(storage)
+        start, end = self._offsets[index], self._offsets[index + 1]
+        mel = self._cache[start:end].view(self.N_MELS, -1)
+        return mel.unsqueeze(0).float()
+
+    def _load_audio(self, audio_path: str) -> torch.Tensor:
+        """
+        Decode a full track directly into a torch tensor at the target
+        sample rate, skipping the numpy round-trip librosa would make.
+        """
+        audio, sr = torchaudio.load(audio_path, backend="soundfile")
+        if audio.shape[0] > 1:
+            audio = audio.mean(dim=0, keepdim=True)
+        if sr != self.sample_rate:
+            if sr not in self._resamplers:
+                self._resamplers[sr] = Resample(sr, self.sample_rate)
+            audio = self._resamplers[sr](audio)
+        return audio
+
     def __getitem__(self, index) -> Dict:
         # load the track for this index
         track = self.tracks[index]
 
-        # load the excerpt
-        data = util.load_excerpt(track.audio_path, self.duration, self.sample_rate)
-        data["label"] = track.instrument_full
-
-        return data
+        # load the cached mel spectrogram for the whole track
+        mel = self._load_mel(index)
+        if mel.shape[-1] < self.n_frames:
+            raise ValueError(f"Audio file {track.audio_path} is too short"
+                   f"to extract an excerpt of duration {self.duration}")
+
+        # crop a random excerpt from the mel spectrogram
+        frame_offset = random.randint(0, mel.shape[-1] - self.n_frames)
+        return {
+            "audio": mel[..., frame_offset:frame_offset + self.n_frames],
+            "offset": frame_offset * self.hop_length / self.sample_rate,
+            "duration": self.duration,
+            "label": track.instrument_full,
+        }
 
     def __len__(self) -> int:
         return len(self.tracks)
@@ -146,7 +272,7 @@ class EpisodeDataset(torch.utils.data.Dataset):
         self.n_support = n_support
         self.n_query = n_query
         self.n_episodes = n_episodes
-    
+
     def __getitem__(self, index: int) -> Tuple[Dict, Dict]:
         """Sample an episode from the class-conditional dataset. 
 
@@ -42,7 +42,7 @@ def evaluate(
     output_dir = Path(checkpoint_path).parent.parent
 
     # load the few-shot learner from checkpoint
-    protonet = PrototypicalNet(Backbone(sample_rate))
+    protonet = PrototypicalNet(Backbone())
     learner = FewShotLearner.load_from_checkpoint(checkpoint_path, protonet=protonet)
     learner.eval()
     learner = learner.to(DEVICE)
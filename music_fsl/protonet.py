@@ -14,12 +14,12 @@ class PrototypicalNet(nn.Module):
         Args:
             support (dict): A dictionary containing the support set. 
                 The support set dict must contain the following keys:
-                    - audio: A tensor of shape (n_support, n_channels, n_samples)
+                    - audio: A tensor of mel spectrograms of shape (n_support, 1, n_mels, n_frames)
                     - label: A tensor of shape (n_support) with label indices
                     - classlist: A tensor of shape (n_classes) containing the list of classes in this episode
             query (dict): A dictionary containing the query set.
                 The query set dict must contain the following keys:
-                    - audio: A tensor of shape (n_query, n_channels, n_samples)
+                    - audio: A tensor of mel spectrograms of shape (n_query, 1, n_mels, n_frames)
         
         Returns:
             logits (torch.Tensor): A tensor of shape (n_query, n_classes) containing the logits
@@ -32,30 +32,31 @@ class PrototypicalNet(nn.Module):
             - embeddings: A tensor of shape (n_query, n_features) containing the embeddings
 
         """
-        # compute the embeddings for the support and query sets
-        support["embeddings"] = self.backbone(support["audio"])
-        query["embeddings"] = self.backbone(query["audio"])
+        # compute the embeddings for the support and query sets in a
+        # single backbone call, halving the kernel launches per episode
+        n_support = support["audio"].shape[0]
+        embeddings = self.backbone(
+            torch.cat([support["audio"], query["audio"]], dim=0)
+        )
+        support["embeddings"] = embeddings[:n_support]
+        query["embeddings"] = embeddings[n_support:]
 
-        # group the support embeddings by class
-        support_embeddings = []
-        for idx in range(len(support["classlist"])):
-            embeddings = support["embeddings"][support["target"] == idx]
-            support_embeddings.append(embeddings)
-        support_embeddings = torch.stack(support_embeddings)
-
-        # compute the prototypes for each class
+        # compute the prototypes for each class. the support set is
+        # collated class by class with the same number of examples per
+        # class, so a reshape groups the embeddings without a python loop
+        n_way = len(support["classlist"])
+        support_embeddings = support["embeddings"].reshape(
+            n_way, -1, support["embeddings"].shape[-1]
+        )
         prototypes = support_embeddings.mean(dim=1)
         support["prototypes"] = prototypes
 
-        # compute the distances between each query and prototype
-        distances = torch.cdist(
-            query["embeddings"].unsqueeze(0), 
-            prototypes.unsqueeze(0),
-            p=2
-        ).squeeze(0)
-
-        # square the distances to get the sq euclidean distance
-        distances = distances ** 2
+        # squared euclidean distances between each query and prototype,
+        # expanded as ||q||^2 + ||p||^2 - 2 q.p so all pairs are covered
+        # by a single matmul
+        q2 = (query["embeddings"] ** 2).sum(dim=-1, keepdim=True)
+        p2 = (prototypes ** 2).sum(dim=-1)
+        distances = q2 + p2 - 2 * query["embeddings"] @ prototypes.t()
         logits = -distances
 
         # return the logits
@@ -64,17 +65,18 @@ class PrototypicalNet(nn.Module):
 
 if __name__ == "__main__":
     from backbone import Backbone
-    backbone = Backbone(sample_rate=16000)
+    backbone = Backbone()
     protonet = PrototypicalNet(backbone)
     print(protonet)
 
     support = {
-        "audio": torch.randn(10, 1, 16000),
-        "target": torch.randint(0, 10, (10,))
+        "audio": torch.randn(10, 1, 64, 81),
+        "target": torch.arange(5).repeat_interleave(2),
+        "classlist": ["a", "b", "c", "d", "e"]
     }
     query = {
-        "audio": torch.randn(10, 1, 16000),
-        "target": torch.randint(0, 10, (10,))
+        "audio": torch.randn(10, 1, 64, 81),
+        "target": torch.randint(0, 5, (10,))
     }
     
     print(protonet(support, query))
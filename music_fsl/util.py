@@ -5,7 +5,6 @@ import random
 
 import torch
 import numpy as np
-import librosa
 from IPython import display
 import matplotlib.pyplot as plt
 
@@ -24,6 +23,7 @@ def load_excerpt(audio_path: str, duration: float, sample_rate: int):
         - offset: the offset (in seconds) of the excerpt
         - duration: the duration (in seconds) of the excerpt
     """
+    import librosa
     total_duration = librosa.get_duration(filename=audio_path)
     if total_duration < duration:
         raise ValueError(f"Audio file {audio_path} is too short"
@@ -205,6 +205,7 @@ def plotly_fig_to_tensor(figure, width=800, height=600):
     return image
 
 def widget(audio_path, title=None):
+    import librosa
 
     # compute the log Mel spectrogram of the audio
     audio, sr = librosa.load(audio_path, mono=True)
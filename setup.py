@@ -13,7 +13,6 @@ setup(
     install_requires=[
         # data
         "mirdata",
-        "librosa",
 
         # training
         "torch",
@@ -23,13 +22,18 @@ setup(
         "pytorch-lightning",
         "tensorboard",
         "argbind",
-
-        # display
-        "torchvision",
-        "sklearn",
-        "umap-learn",
-        "pandas",
-        "plotly",
-        "kaleido",
     ],
+    extras_require={
+        # display / analysis only -- keeping these out of the core deps
+        # keeps DataLoader worker start-up light
+        "viz": [
+            "librosa",
+            "torchvision",
+            "sklearn",
+            "umap-learn",
+            "pandas",
+            "plotly",
+            "kaleido",
+        ],
+    },
 )
\ No newline at end of file